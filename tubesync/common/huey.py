@@ -361,13 +361,12 @@ def on_executing_remove_duplicates(signal_name, task_obj, exception_obj=None, /,
     assert signals.SIGNAL_EXECUTING == signal_name
 
     from common.models import TaskHistory
-    try:
-        th = TaskHistory.objects.get(task_id=str(task_obj.id))
-    except TaskHistory.DoesNotExist:
+    # only the flag is needed, a missing row is treated as False
+    remove_duplicates = TaskHistory.objects.filter(
+        task_id=str(task_obj.id),
+    ).values_list('remove_duplicates', flat=True).first()
+    if not remove_duplicates:
         return
-    else:
-        if not th.remove_duplicates:
-            return
 
     def task_generator(queue):
         for t in queue.pending():
@@ -377,13 +376,14 @@ def on_executing_remove_duplicates(signal_name, task_obj, exception_obj=None, /,
 
     def waiting_id_generator(queue, task_obj):
         for t in task_generator(queue):
-            matches = all((
-                task_obj.id != t.id,
-                task_obj.name == t.name,
-                task_obj.data == t.data,
-                task_obj.priority >= t.priority,
-                task_obj.retries <= t.retries,
-            ))
+            # cheapest comparisons first, stop at the first mismatch
+            matches = (
+                task_obj.name == t.name and
+                task_obj.id != t.id and
+                task_obj.priority >= t.priority and
+                task_obj.retries <= t.retries and
+                task_obj.data == t.data
+            )
             if matches:
                 yield t.id
 
@@ -171,7 +171,8 @@ def filter_duration(instance: Media):
         if instance.metadata_duration:
             duration = instance.metadata_duration
             instance.duration = duration
-            instance.save()
+            # Do not use save here, post_save would filter this media again
+            Media.objects.filter(pk=instance.pk).update(duration=duration)
         else:
             log.info(
                 f"Media: {instance.source} / {instance} has no duration stored, not skipping"
@@ -2,33 +2,51 @@ from functools import partial
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from django.conf import settings
-from django.db import IntegrityError
+from django.db import DatabaseError, IntegrityError
 from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.db.transaction import atomic, on_commit
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from common.logger import log
 from common.models import TaskHistory
-from common.utils import glob_quote, mkdir_p
+from common.utils import mkdir_p
 from .models import Source, Media, Metadata
 from .tasks import (
-    get_media_download_task, get_media_metadata_task, get_media_thumbnail_task,
+    get_running_task_names,
     delete_all_media_for_source, save_all_media_for_source,
     check_source_directory_exists, download_source_images, index_source,
     download_media_file, download_media_metadata, download_media_image,
 )
-from .utils import delete_file
+from .utils import delete_file, files_with_prefix
 from .filtering import filter_media
 
 
+def schedule_index_source(source, /, **kwargs):
+    on_commit(partial(
+        TaskHistory.schedule,
+        index_source,
+        str(source.pk),
+        vn_fmt=_('Index media from source "{}"'),
+        vn_args=(source.name,),
+        **kwargs,
+    ))
+
+
 @receiver(pre_save, sender=Source)
 def source_pre_save(sender, instance, **kwargs):
     source = instance # noqa: F841
     # Triggered before a source is saved, if the schedule has been updated recreate
     # its indexing task
-    try:
-        existing_source = Source.objects.get(pk=instance.pk)
-    except Source.DoesNotExist:
+    # Only load the fields that are compared below
+    existing_source = Source.objects.only(
+        'pk',
+        'name',
+        'directory',
+        'source_resolution', # for directory_path
+        'copy_channel_images',
+        'index_schedule',
+    ).filter(pk=instance.pk).first()
+    if existing_source is None:
         log.debug(f'source_pre_save signal: no existing source: {sender} - {instance}')
         return
 
@@ -37,7 +55,7 @@ def source_pre_save(sender, instance, **kwargs):
     existing_copy_channel_images = existing_source.copy_channel_images
     new_copy_channel_images = instance.copy_channel_images
     if new_copy_channel_images and not existing_copy_channel_images:
-        download_source_images(str(instance.pk))
+        on_commit(partial(download_source_images, *args))
     existing_dirpath = existing_source.directory_path.resolve(strict=True)
     new_dirpath = instance.directory_path.resolve(strict=False)
     if existing_dirpath != new_dirpath:
@@ -94,43 +112,36 @@ def source_pre_save(sender, instance, **kwargs):
     )
     if recreate_index_source_task:
         # Indexing schedule has changed, recreate the indexing task
-        TaskHistory.schedule(
-            index_source,
-            str(instance.pk),
+        schedule_index_source(
+            instance,
             eta=instance.task_run_at_dt,
             remove_duplicates=True,
-            vn_fmt=_('Index media from source "{}"'),
-            vn_args=(instance.name,),
         )
 
 
 @receiver(post_save, sender=Source)
 def source_post_save(sender, instance, created, **kwargs):
     source = instance
+    source_pk = str(source.pk)
     # Check directory exists and create an indexing task for newly created sources
     if created:
-        check_source_directory_exists(str(source.pk))
+        on_commit(partial(check_source_directory_exists, source_pk))
         if source.copy_channel_images:
-            download_source_images(str(source.pk))
+            on_commit(partial(download_source_images, source_pk))
         if source.is_active:
             log.info(f'Scheduling first media indexing for source: {source.name}')
-            TaskHistory.schedule(
-                index_source,
-                str(source.pk),
-                delay=600,
-                vn_fmt=_('Index media from source "{}"'),
-                vn_args=(source.name,),
-            )
+            schedule_index_source(source, delay=600)
 
-    TaskHistory.schedule(
+    on_commit(partial(
+        TaskHistory.schedule,
         save_all_media_for_source,
-        str(source.pk),
+        source_pk,
         remove_duplicates=True,
         vn_fmt = _('Checking all media for "{}"'),
         vn_args=(
             source.name,
         ),
-    )
+    ))
 
 
 @receiver(pre_delete, sender=Source)
@@ -142,9 +153,8 @@ def source_pre_delete(sender, instance, **kwargs):
     instance.deactivate()
 
     # Fetch the media source
-    sqs = Source.objects.filter(filter_text=str(source.pk))
-    if sqs.count():
-        media_source = sqs[0]
+    media_source = Source.objects.filter(filter_text=str(source.pk)).first()
+    if media_source:
         # Schedule deletion of media
         on_commit(partial(
             TaskHistory.schedule,
@@ -171,15 +181,20 @@ def media_post_save(sender, instance, created, **kwargs):
     # Reset the skip flag if the download cap has changed if the media has not
     # already been downloaded
     downloaded = instance.downloaded
-    existing_media_thumbnail_task = get_media_thumbnail_task(str(instance.pk))
-    existing_media_metadata_task = get_media_metadata_task(str(instance.pk))
-    existing_media_download_task = get_media_download_task(str(instance.pk))
+    # these are used more than once below, only compute them once
+    media_pk = str(instance.pk)
+    has_metadata = media.has_metadata
+    # one query for all of the running tasks for this media
+    running_task_names = get_running_task_names(media_pk)
+    existing_media_thumbnail_task = 'sync.tasks.download_media_image' in running_task_names
+    existing_media_metadata_task = 'sync.tasks.download_media_metadata' in running_task_names
+    existing_media_download_task = 'sync.tasks.download_media_file' in running_task_names
     if not downloaded:
         # the decision to download was already made if a download task exists
         if not existing_media_download_task:
             # Recalculate the "can_download" flag, this may
             # need to change if the source specifications have been changed
-            if media.has_metadata:
+            if has_metadata:
                 if instance.get_format_str():
                     if not instance.can_download:
                         instance.can_download = True
@@ -192,15 +207,16 @@ def media_post_save(sender, instance, created, **kwargs):
             skip_changed = filter_media(instance)
 
     # If the media is missing metadata schedule it to be downloaded
-    if not (media.skip or media.has_metadata or existing_media_metadata_task):
+    if not (media.skip or has_metadata or existing_media_metadata_task):
         log.info(f'Scheduling task to download metadata for: {media.url}')
-        TaskHistory.schedule(
+        on_commit(partial(
+            TaskHistory.schedule,
             download_media_metadata,
-            str(media.pk),
+            media_pk,
             remove_duplicates=True,
             vn_fmt=_('Downloading metadata for: {}: "{}"'),
             vn_args=(media.key, media.name,),
-        )
+        ))
     # If the media is missing a thumbnail schedule it to be downloaded (unless we are skipping this media)
     if not media.thumb_file_exists:
         media.thumb = None
@@ -211,17 +227,21 @@ def media_post_save(sender, instance, created, **kwargs):
                 'Scheduling task to download thumbnail'
                 f' for: {media.name} from: {thumbnail_url}'
             )
-            TaskHistory.schedule(
+            on_commit(partial(
+                TaskHistory.schedule,
                 download_media_image,
-                str(media.pk),
+                media_pk,
                 thumbnail_url,
                 vn_fmt=_('Downloading thumbnail for "{}"'),
                 vn_args=(media.name,),
-            )
+            ))
     media_file_exists = False
     try:
-        media_file_exists |= instance.media_file_exists
-        media_file_exists |= instance.filepath.exists()
+        # only stat the computed path when the recorded file is missing
+        media_file_exists = (
+            instance.media_file_exists or
+            instance.filepath.exists()
+        )
     except OSError as e:
         log.exception(e)
         pass
@@ -234,21 +254,24 @@ def media_post_save(sender, instance, created, **kwargs):
         downloaded = False
     if (instance.source.download_media and instance.can_download) and not (
         instance.skip or downloaded or existing_media_download_task):
-        TaskHistory.schedule(
+        on_commit(partial(
+            TaskHistory.schedule,
             download_media_file,
-            str(media.pk),
+            media_pk,
             remove_duplicates=True,
             vn_fmt=_('Downloading media for "{}"'),
             vn_args=(media.name,),
-        )
+        ))
     # Save the instance if any changes were required
-    if skip_changed or can_download_changed:
+    updates = dict()
+    if can_download_changed:
+        updates['can_download'] = instance.can_download
+    if skip_changed:
+        updates['skip'] = instance.skip
+    if updates:
         Media.objects.filter(
             pk=instance.pk,
-        ).update(
-            can_download=instance.can_download,
-            skip=instance.skip,
-        )
+        ).update(**updates)
 
 
 @receiver(pre_delete, sender=Media)
@@ -273,7 +296,16 @@ def media_pre_delete(sender, instance, **kwargs):
     instance.metadata = instance.metadata_dumps(arg_dict=arg_dict)
     # Do not create more tasks before deleting
     instance.manual_skip = True
-    instance.save()
+    try:
+        # a savepoint keeps a failed save from breaking an outer transaction
+        with atomic(durable=False):
+            instance.save(update_fields={'metadata', 'manual_skip'})
+    except DatabaseError as e:
+        # the row was already deleted, so there is nothing to save
+        if 'Save with update_fields did not affect any rows.' == str(e):
+            pass
+        else:
+            raise
 
 
 @receiver(post_delete, sender=Media)
@@ -288,6 +320,8 @@ def media_post_delete(sender, instance, **kwargs):
     if remove_files:
         video_path = Path(str(instance.media_file.path)).resolve(strict=False)
         instance.media_file.delete(save=False)
+        # the path without the extension, shared by all of the related files
+        bare_path = video_path.with_suffix('')
         # the other files we created have these known suffixes
         for suffix in frozenset(('nfo', 'jpg', 'webp', 'info.json',)):
             other_path = video_path.with_suffix(f'.{suffix}').resolve(strict=False)
@@ -295,14 +329,14 @@ def media_post_delete(sender, instance, **kwargs):
                 log.info(f'Deleting file for: {instance} path: {other_path!s}')
                 delete_file(other_path)
         # subtitles include language code
-        subtitle_files = video_path.parent.glob(f'{glob_quote(video_path.with_suffix("").name)}*.vtt')
+        subtitle_files = files_with_prefix(bare_path.parent, bare_path.name, suffix='.vtt')
         for file in subtitle_files:
             log.info(f'Deleting file for: {instance} path: {file}')
             delete_file(file)
         # Jellyfin creates .trickplay directories and posters
         for suffix in frozenset(('.trickplay', '-poster.jpg', '-poster.webp',)):
             # with_suffix insists on suffix beginning with '.' for no good reason
-            other_path = Path(str(video_path.with_suffix('')) + suffix).resolve(strict=False)
+            other_path = Path(str(bare_path) + suffix).resolve(strict=False)
             if other_path.is_file():
                 log.info(f'Deleting file for: {instance} path: {other_path!s}')
                 delete_file(other_path)
@@ -335,7 +369,7 @@ def media_post_delete(sender, instance, **kwargs):
                 except OSError:
                     pass
         # Get all files that start with the bare file path
-        all_related_files = video_path.parent.glob(f'{glob_quote(video_path.with_suffix("").name)}*')
+        all_related_files = files_with_prefix(bare_path.parent, bare_path.name)
         for file in all_related_files:
             log.info(f'Deleting file for: {instance} path: {file}')
             delete_file(file)
@@ -17,6 +17,7 @@ from shutil import copyfile, rmtree
 from django import db
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.deletion import Collector
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_huey import lock_task as huey_lock_task, task as huey_task # noqa
@@ -41,6 +42,8 @@ from .youtube import YouTubeError
 
 atomic = db.transaction.atomic
 db_vendor = db.connection.vendor
+# how many media items delete_all_media_for_source deletes per transaction
+MEDIA_DELETE_BATCH_SIZE = 500
 register_huey_signals()
 
 
@@ -187,6 +190,10 @@ def get_first_task(task_name, id=None, /, *, instance=None):
 def get_media_metadata_task(media_id):
     return get_first_task('sync.tasks.download_media_metadata', media_id)
 
+def get_running_task_names(instance_id, /):
+    tqs = get_model_tasks(instance_id, qs=get_running_tasks())
+    return frozenset(tqs.values_list('name', flat=True))
+
 
 def cleanup_completed_tasks():
     days_to_keep = getattr(settings, 'COMPLETED_TASKS_DAYS_TO_KEEP', 30)
@@ -308,9 +315,14 @@ def schedule_indexing():
 
 def schedule_media_servers_update():
     # Schedule a task to update media servers
+    # Inside a transaction this is deferred until the commit
+    db.transaction.on_commit(_schedule_media_servers_update)
+
+
+def _schedule_media_servers_update():
     log.info('Scheduling media server updates')
-    for mediaserver in MediaServer.objects.all():
-        rescan_media_server(str(mediaserver.pk))
+    for mediaserver_pk in MediaServer.objects.values_list('pk', flat=True):
+        rescan_media_server(str(mediaserver_pk))
 
 
 def contains_http429(q, task_id, /):
@@ -757,7 +769,8 @@ def rename_media(media_id):
 @atomic(durable=True)
 def save_media(media_id):
     try:
-        media = Media.objects.get(pk=media_id)
+        # the post_save signal uses the source, fetch it in the same query
+        media = Media.objects.select_related('source').get(pk=media_id)
     except Media.DoesNotExist as e:
         raise CancelExecution(_('no such media'), retry=False) from e
     else:
@@ -858,7 +871,7 @@ def download_media_metadata(media_id):
             if published_datetime:
                 media.published = published_datetime
                 media.manual_skip = True
-                media.save()
+                media.save(update_fields={'published', 'manual_skip'})
                 raise_exception = False
         if raise_exception:
             raise
@@ -1249,14 +1262,27 @@ def delete_all_media_for_source(source_id, source_name, source_directory):
     ).filter(
         source=source or source_id,
     )
-    delete_media.map({
-        str(media.pk)
-        for media in qs_gen(mqs)
-    })
-    with atomic(durable=True):
-        mqs.update(manual_skip=True, skip=True)
+    if mqs.exists():
+        delete_media.map({
+            str(media_pk)
+            for media_pk in mqs.values_list('pk', flat=True)
+        })
+        with atomic(durable=True):
+            mqs.update(manual_skip=True, skip=True)
         log.info(f'Deleting media for source: {source_name}')
-        mqs.delete()
+        # Delete in batches, so that the collector does not load
+        # every media item for a large source into memory at once
+        pk_qs = mqs.values_list('pk', flat=True).order_by('pk')
+        while batch := list(pk_qs[:MEDIA_DELETE_BATCH_SIZE]):
+            # QuerySet.delete() drops select_related, so collect the
+            # instances directly, then the signals do not query each source
+            batch_qs = Media.objects.filter(pk__in=batch).select_related('source')
+            collector = Collector(using=batch_qs.db, origin=batch_qs)
+            with atomic(durable=True):
+                collector.collect(list(batch_qs))
+                collector.delete()
+        # Schedule a task to update media servers, once for the whole source
+        schedule_media_servers_update()
     # Remove the directory, if the user requested that
     directory_path = Path(source_directory)
     remove = (
@@ -1,9 +1,11 @@
 import logging
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 from sync.models import Source, Media
+from sync.utils import files_with_prefix
 from sync.choices import (
     Val, Fallback, SourceResolution,
     YouTube_AudioCodec, YouTube_VideoCodec,
@@ -244,3 +246,33 @@ class FilepathTestCase(TestCase):
         self.assertEqual(downloaded_audio.format_dict['resolution'], 'audio')
         self.assertEqual(downloaded_audio.format_dict['height'], '0')
         self.source.source_resolution = Val(SourceResolution.VIDEO_1080P)
+
+
+class FilesWithPrefixTestCase(TestCase):
+
+    def test_glob_special_characters(self):
+        with TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            stem = 'video [abc] *?'
+            expected = {
+                directory / f'{stem}.mkv',
+                directory / f'{stem}.en.vtt',
+                directory / f'{stem}-poster.jpg',
+            }
+            unrelated = {
+                directory / 'video a *?.mkv',
+                directory / 'video [abc].mkv',
+                directory / 'other.mkv',
+            }
+            for path in expected | unrelated:
+                path.touch()
+            self.assertEqual(set(files_with_prefix(directory, stem)), expected)
+            self.assertEqual(
+                files_with_prefix(directory, stem, suffix='.vtt'),
+                [directory / f'{stem}.en.vtt'],
+            )
+
+    def test_missing_directory(self):
+        with TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir) / 'missing'
+            self.assertEqual(files_with_prefix(directory, 'video'), [])
@@ -189,7 +189,9 @@ class FrontEndTestCase(TestCase):
             'sponsorblock_categories': data_categories,
             'sub_langs': 'en',
         }
-        response = c.post('/source-add', data)
+        # Run the tasks scheduled when the transaction is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = c.post('/source-add', data)
         self.assertEqual(response.status_code, 302)
         url_parts = urlsplit(response.url)
         url_path = str(url_parts.path).strip()
@@ -287,7 +289,8 @@ class FrontEndTestCase(TestCase):
             'sponsorblock_categories': data_categories,
             'sub_langs': 'en',
         }
-        response = c.post(f'/source-update/{source_uuid}', data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = c.post(f'/source-update/{source_uuid}', data)
         self.assertEqual(response.status_code, 302)
         url_parts = urlsplit(response.url)
         url_path = str(url_parts.path).strip()
@@ -350,27 +353,28 @@ class FrontEndTestCase(TestCase):
         test_minimal_metadata = all_test_metadata['minimal']
         before_dt = timezone.now()
         past_date = timezone.make_aware(datetime(year=2000, month=1, day=1))
-        test_media1 = Media.objects.create(
-            key='mediakey1',
-            source=test_source,
-            published=past_date,
-            metadata=test_minimal_metadata
-        )
-        test_media1_pk = str(test_media1.pk)
-        test_media2 = Media.objects.create(
-            key='mediakey2',
-            source=test_source,
-            published=past_date,
-            metadata=test_minimal_metadata
-        )
-        test_media2_pk = str(test_media2.pk)
-        test_media3 = Media.objects.create(
-            key='mediakey3',
-            source=test_source,
-            published=past_date,
-            metadata=test_minimal_metadata
-        )
-        test_media3_pk = str(test_media3.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            test_media1 = Media.objects.create(
+                key='mediakey1',
+                source=test_source,
+                published=past_date,
+                metadata=test_minimal_metadata
+            )
+            test_media1_pk = str(test_media1.pk)
+            test_media2 = Media.objects.create(
+                key='mediakey2',
+                source=test_source,
+                published=past_date,
+                metadata=test_minimal_metadata
+            )
+            test_media2_pk = str(test_media2.pk)
+            test_media3 = Media.objects.create(
+                key='mediakey3',
+                source=test_source,
+                published=past_date,
+                metadata=test_minimal_metadata
+            )
+            test_media3_pk = str(test_media3.pk)
         # simulate the tasks consumer signals having already run
         now_dt = timezone.now()
         TaskHistory.objects.filter(
@@ -62,6 +62,14 @@ class MediaTestCase(TestCase):
             self.assertEqual(expected_node.tag, nfo_node.tag)
             self.assertEqual(expected_node.text, nfo_node.text)
 
+    def test_delete_stale_instance(self):
+        # Another worker deleted the row after this instance was loaded
+        stale = Media.objects.get(pk=self.media.pk)
+        Media.objects.get(pk=self.media.pk).delete()
+        self.assertFalse(Media.objects.filter(pk=self.media.pk).exists())
+        stale.delete()
+        self.assertFalse(Media.objects.filter(pk=self.media.pk).exists())
+
 
 class MediaFilterTestCase(TestCase):
 
@@ -1,10 +1,14 @@
 import logging
 from datetime import timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.db.models.signals import pre_delete
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from sync.models import Source, Media
 from sync.tasks import (
-    cleanup_old_media,
+    cleanup_old_media, delete_all_media_for_source,
 )
 
 class TasksTestCase(TestCase):
@@ -36,3 +40,58 @@ class TasksTestCase(TestCase):
         self.assertEqual(src2.media_source.all().count(), 3)
         self.assertEqual(Media.objects.filter(pk=m22.pk).exists(), False)
         self.assertEqual(Media.objects.filter(source=src2, key=m22.key, skip=True).exists(), True)
+
+    @patch('sync.tasks.schedule_media_servers_update')
+    @patch('sync.tasks.delete_media')
+    @patch('sync.tasks.MEDIA_DELETE_BATCH_SIZE', 2)
+    def test_delete_all_media_for_source(self, mock_delete_media, mock_update):
+        src = Source.objects.create(key='ccc', name='ccc', directory='/tmp/c', delete_old_media=False, days_to_keep=14)
+        source_id = str(src.pk)
+        for n in range(5):
+            Media.objects.create(source=src, key=f'c{n}')
+        pks = list(Media.objects.filter(source=src).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(len(pks), 5)
+
+        # Another worker deletes media while the batches are being deleted,
+        # one from the batch that was just loaded and one from a later batch
+        deleted_elsewhere = list()
+        def delete_elsewhere(sender, instance, **kwargs):
+            if deleted_elsewhere:
+                return
+            deleted_elsewhere.extend((pks[1], pks[3],))
+            for pk in deleted_elsewhere:
+                Media.objects.get(pk=pk).delete()
+        pre_delete.connect(delete_elsewhere, sender=Media, weak=False)
+        self.addCleanup(pre_delete.disconnect, delete_elsewhere, sender=Media)
+
+        delete_all_media_for_source.call_local(source_id, src.name, str(src.directory_path))
+
+        self.assertEqual(deleted_elsewhere, [pks[1], pks[3]])
+        self.assertFalse(Media.objects.filter(pk__in=pks).exists())
+        self.assertFalse(Media.objects.filter(source_id=source_id).exists())
+        self.assertFalse(Source.objects.filter(pk=source_id).exists())
+        mock_delete_media.map.assert_called_once_with({str(pk) for pk in pks})
+        mock_update.assert_called_once_with()
+
+    @patch('sync.tasks.schedule_media_servers_update')
+    @patch('sync.tasks.delete_media')
+    @patch('sync.tasks.MEDIA_DELETE_BATCH_SIZE', 2)
+    def test_delete_all_media_for_source_queries(self, mock_delete_media, mock_update):
+        source_table = connection.ops.quote_name(Source._meta.db_table)
+
+        def count_source_selects(num_media):
+            key = f'q{num_media}'
+            src = Source.objects.create(key=key, name=key, directory=f'/tmp/{key}', delete_old_media=False, days_to_keep=14)
+            for n in range(num_media):
+                Media.objects.create(source=src, key=f'{key}-{n}')
+            with CaptureQueriesContext(connection) as ctx:
+                delete_all_media_for_source.call_local(str(src.pk), src.name, str(src.directory_path))
+            self.assertFalse(Media.objects.filter(source_id=src.pk).exists())
+            return len([
+                query for query in ctx.captured_queries
+                if query['sql'].startswith('SELECT') and f'FROM {source_table}' in query['sql']
+            ])
+
+        # The source is loaded with each batch of media,
+        # so more media must not mean more queries for the source
+        self.assertEqual(count_source_selects(2), count_source_selects(6))
@@ -140,6 +140,23 @@ def delete_file(filepath):
     return False
 
 
+def files_with_prefix(directory, prefix, /, *, suffix=''):
+    '''
+        Returns the paths in a directory with names that start with prefix and
+        end with suffix. The names are compared as strings, so no characters
+        are special as they would be in a glob pattern. A missing directory
+        returns an empty list.
+    '''
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                Path(entry.path) for entry in entries
+                if entry.name.startswith(prefix) and entry.name.endswith(suffix)
+            ]
+    except OSError:
+        return []
+
+
 def normalize_codec(codec_str):
     result = str(codec_str).upper()
     parts = result.split('.')